@@ -0,0 +1,139 @@
+"""
+Box kernels for the YOLO Image Labeler
+
+Hit-testing and YOLO label conversion loops are compiled with Numba when it
+is installed, so a click or a label file costs a single pass over the rows
+without temporary arrays. The same functions are also implemented with NumPy
+masks (the *_numpy variants); those are used when Numba is missing, and are
+always defined so both implementations can be tested against each other.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def box_at_numpy(boxes, x, y):
+    """Return the index of the first box containing (x, y), or -1"""
+    hit = ((boxes[:, 0] <= x) & (x <= boxes[:, 2]) &
+           (boxes[:, 1] <= y) & (y <= boxes[:, 3]))
+    if not hit.any():
+        return -1
+    return int(np.argmax(hit))
+
+
+def handle_at_numpy(boxes, x, y, tolerance):
+    """Find the first box corner within tolerance of (x, y)
+
+    Corners are tested in tl, tr, bl, br order. Returns
+    (box_index, corner_index) or (-1, -1).
+    """
+    # (N, 4, 2) corner coordinates in tl, tr, bl, br order
+    corners = boxes[:, [[0, 1], [2, 1], [0, 3], [2, 3]]]
+    near = ((np.abs(corners[..., 0] - x) <= tolerance) &
+            (np.abs(corners[..., 1] - y) <= tolerance)).ravel()
+    if not near.any():
+        return -1, -1
+    return divmod(int(np.argmax(near)), 4)
+
+
+def yolo_rows_to_boxes_numpy(rows, lookup, width, height):
+    """Convert (N, 5) YOLO rows to pixel boxes and class indices
+
+    lookup maps a YOLO class ID to a class index, or -1. Rows with
+    non-finite values, non-integer or unknown class IDs are skipped.
+    Returns ((M, 4) int32 [x1, y1, x2, y2] boxes, (M,) int32 class indices).
+    """
+    rows = rows[np.isfinite(rows).all(axis=1)]
+
+    # Map YOLO class IDs to class indices
+    rows = rows[(rows[:, 0] >= 0) & (rows[:, 0] < len(lookup))]
+    yolo_ids = rows[:, 0].astype(np.int64)
+    integral = yolo_ids == rows[:, 0]
+    rows = rows[integral]
+    class_ids = lookup[yolo_ids[integral]]
+    known = class_ids >= 0
+    rows = rows[known]
+    class_ids = class_ids[known]
+
+    # Denormalize to corner coordinates and clamp to image bounds
+    size = np.array([width, height, width, height], dtype=np.float64)
+    corners = (rows[:, [1, 2, 1, 2]] * size +
+               rows[:, [3, 4, 3, 4]] * size * np.array([-0.5, -0.5, 0.5, 0.5]))
+    np.clip(corners, 0, size - 1, out=corners)
+    return corners.astype(np.int32), class_ids.astype(np.int32)
+
+
+if njit is not None:
+    @njit(cache=True)
+    def box_at(boxes, x, y):
+        """Return the index of the first box containing (x, y), or -1"""
+        for i in range(boxes.shape[0]):
+            if boxes[i, 0] <= x <= boxes[i, 2] and boxes[i, 1] <= y <= boxes[i, 3]:
+                return i
+        return -1
+
+    @njit(cache=True)
+    def handle_at(boxes, x, y, tolerance):
+        """Find the first box corner within tolerance of (x, y)
+
+        Corners are tested in tl, tr, bl, br order. Returns
+        (box_index, corner_index) or (-1, -1).
+        """
+        for i in range(boxes.shape[0]):
+            for corner in range(4):
+                cx = boxes[i, 0] if corner % 2 == 0 else boxes[i, 2]
+                cy = boxes[i, 1] if corner < 2 else boxes[i, 3]
+                if abs(cx - x) <= tolerance and abs(cy - y) <= tolerance:
+                    return i, corner
+        return -1, -1
+
+    @njit(cache=True)
+    def yolo_rows_to_boxes(rows, lookup, width, height):
+        """Convert (N, 5) YOLO rows to pixel boxes and class indices
+
+        lookup maps a YOLO class ID to a class index, or -1. Rows with
+        non-finite values, non-integer or unknown class IDs are skipped.
+        Returns ((M, 4) int32 [x1, y1, x2, y2] boxes, (M,) int32 class indices).
+        """
+        boxes = np.empty((rows.shape[0], 4), dtype=np.int32)
+        class_ids = np.empty(rows.shape[0], dtype=np.int32)
+        max_x = width - 1.0
+        max_y = height - 1.0
+        count = 0
+        for i in range(rows.shape[0]):
+            yolo_id = rows[i, 0]
+            if not (yolo_id >= 0 and yolo_id < lookup.shape[0]) or yolo_id != int(yolo_id):
+                continue
+            class_id = lookup[int(yolo_id)]
+            if class_id < 0:
+                continue
+            if not (np.isfinite(rows[i, 1]) and np.isfinite(rows[i, 2]) and
+                    np.isfinite(rows[i, 3]) and np.isfinite(rows[i, 4])):
+                continue
+
+            x_center = rows[i, 1] * width
+            y_center = rows[i, 2] * height
+            half_width = rows[i, 3] * width * 0.5
+            half_height = rows[i, 4] * height * 0.5
+            boxes[count, 0] = int(min(max(x_center - half_width, 0.0), max_x))
+            boxes[count, 1] = int(min(max(y_center - half_height, 0.0), max_y))
+            boxes[count, 2] = int(min(max(x_center + half_width, 0.0), max_x))
+            boxes[count, 3] = int(min(max(y_center + half_height, 0.0), max_y))
+            class_ids[count] = class_id
+            count += 1
+        return boxes[:count], class_ids[:count]
+
+    # Compile now, for the int32 box arrays the labeler uses, so the first
+    # click doesn't stall on the JIT
+    box_at(np.zeros((1, 4), dtype=np.int32), 0, 0)
+    handle_at(np.zeros((1, 4), dtype=np.int32), 0, 0, 10)
+    yolo_rows_to_boxes(np.zeros((1, 5)), np.zeros(1, dtype=np.int32), 1, 1)
+
+else:
+    box_at = box_at_numpy
+    handle_at = handle_at_numpy
+    yolo_rows_to_boxes = yolo_rows_to_boxes_numpy
@@ -0,0 +1,229 @@
+"""
+Tests for the YOLO Image Labeler
+
+They need no display: the labeler is created with mock Tk widgets where the
+UI is involved.
+"""
+
+from unittest import mock
+
+import numpy as np
+import pytest
+
+import _boxops
+import yolo_labeler
+
+
+def implementations(name):
+    """The NumPy version of a _boxops function, plus the Numba one if installed"""
+    params = [pytest.param(getattr(_boxops, name + '_numpy'), id='numpy')]
+    if _boxops.njit is not None:
+        params.append(pytest.param(getattr(_boxops, name), id='numba'))
+    return params
+
+
+def make_labeler(class_ids=(5, 0, 7, 5, 40)):
+    """A labeler without UI, holding classes with the given YOLO IDs"""
+    labeler = yolo_labeler.YOLOLabeler.__new__(yolo_labeler.YOLOLabeler)
+    labeler.classes = yolo_labeler.ClassTable()
+    for i, class_id in enumerate(class_ids):
+        labeler.classes.add(f"class{i}", '#123456', class_id)
+    return labeler
+
+
+def random_boxes(rng, count):
+    x = np.sort(rng.integers(0, 200, size=(count, 2)), axis=1)
+    y = np.sort(rng.integers(0, 150, size=(count, 2)), axis=1)
+    return np.column_stack([x[:, 0], y[:, 0], x[:, 1], y[:, 1]]).astype(np.int32)
+
+
+@pytest.mark.parametrize('box_at', implementations('box_at'))
+def test_box_at_matches_first_containing_box(box_at):
+    rng = np.random.default_rng(0)
+    boxes = random_boxes(rng, 30)
+    for x, y in rng.integers(-5, 205, size=(500, 2)).tolist():
+        expected = next((i for i, (x1, y1, x2, y2) in enumerate(boxes.tolist())
+                         if x1 <= x <= x2 and y1 <= y <= y2), -1)
+        assert box_at(boxes, x, y) == expected
+    assert box_at(np.empty((0, 4), dtype=np.int32), 0, 0) == -1
+
+
+@pytest.mark.parametrize('handle_at', implementations('handle_at'))
+def test_handle_at_uses_baseline_corner_order(handle_at):
+    rng = np.random.default_rng(1)
+    boxes = random_boxes(rng, 30)
+    for x, y in rng.integers(-5, 205, size=(500, 2)).tolist():
+        expected = (-1, -1)
+        for i, (x1, y1, x2, y2) in enumerate(boxes.tolist()):
+            # Corners in the order the handle names are tested: tl, tr, bl, br
+            corners = ((x1, y1), (x2, y1), (x1, y2), (x2, y2))
+            hit = next((c for c, (cx, cy) in enumerate(corners)
+                        if abs(cx - x) <= 10 and abs(cy - y) <= 10), None)
+            if hit is not None:
+                expected = (i, hit)
+                break
+        assert tuple(handle_at(boxes, x, y, 10)) == expected
+    
+    # A point near every corner of a tiny box resolves to the top-left one
+    tiny = np.array([[50, 50, 52, 52]], dtype=np.int32)
+    assert yolo_labeler.HANDLE_NAMES[handle_at(tiny, 51, 51, 10)[1]] == 'tl'
+
+
+@pytest.mark.parametrize('yolo_rows_to_boxes', implementations('yolo_rows_to_boxes'))
+@pytest.mark.parametrize('size', [(640, 480), (1000, 1), (37, 999)])
+def test_yolo_rows_to_boxes_matches_yolo_to_box(yolo_rows_to_boxes, size):
+    labeler = make_labeler()
+    rng = np.random.default_rng(2)
+    lines = [f"{rng.integers(-2, 45)} " + " ".join(f"{v:.6f}" for v in rng.random(4) * 1.3 - 0.1)
+             for _ in range(2000)]
+    # Fractional, non-finite, huge and unknown class IDs, and a NaN coordinate
+    lines += ["3.5 0.5 0.5 0.1 0.1", "nan 0.5 0.5 0.1 0.1", "inf 0.5 0.5 0.1 0.1",
+              "1e300 0.5 0.5 0.1 0.1", "41 0.5 0.5 0.1 0.1", "1 nan 0.5 0.1 0.1"]
+    width, height = size
+    
+    expected = [box for box in (labeler.yolo_to_box(line, width, height) for line in lines) if box]
+    boxes, class_ids = yolo_rows_to_boxes(np.loadtxt(lines, ndmin=2),
+                                          labeler.classes.index_lookup(), width, height)
+    
+    assert boxes.dtype == np.int32 and class_ids.dtype == np.int32
+    assert boxes.tolist() == [[b['x1'], b['y1'], b['x2'], b['y2']] for b in expected]
+    assert class_ids.tolist() == [b['class_id'] for b in expected]
+
+
+@pytest.mark.parametrize('yolo_rows_to_boxes', implementations('yolo_rows_to_boxes'))
+def test_yolo_rows_to_boxes_skips_infinite_coordinates(yolo_rows_to_boxes):
+    labeler = make_labeler()
+    rows = np.array([[0, 0.5, np.inf, 0.1, 0.1], [0, 0.5, 0.5, 0.2, 0.2]])
+    boxes, class_ids = yolo_rows_to_boxes(rows, labeler.classes.index_lookup(), 100, 100)
+    assert boxes.tolist() == [[40, 40, 60, 60]]
+    assert class_ids.tolist() == [1]
+
+
+@pytest.mark.parametrize('yolo_rows_to_boxes', implementations('yolo_rows_to_boxes'))
+def test_yolo_rows_to_boxes_empty(yolo_rows_to_boxes):
+    labeler = make_labeler()
+    boxes, class_ids = yolo_rows_to_boxes(np.empty((0, 5)), labeler.classes.index_lookup(), 10, 10)
+    assert boxes.shape == (0, 4) and class_ids.shape == (0,)
+
+
+def save_image(path, mode='RGB', size=(123, 45), **params):
+    yolo_labeler.Image.new(mode, size, 'white').save(path, **params)
+    return path
+
+
+def exif_with_orientation():
+    exif = yolo_labeler.Image.Exif()
+    exif[0x0112] = 6  # orientation: rotated, which must not swap the stored size
+    exif[0x010F] = 'Camera maker'
+    return exif
+
+
+@pytest.mark.parametrize('name, mode, params', [
+    ('plain.png', 'RGB', {}),
+    ('rgba.png', 'RGBA', {}),
+    ('gray.png', 'L', {'optimize': True}),
+    ('palette.gif', 'P', {}),
+    ('rgb.bmp', 'RGB', {}),
+    ('mono.bmp', '1', {}),
+    ('baseline.jpg', 'RGB', {}),
+    ('gray.jpg', 'L', {}),
+    ('progressive.jpg', 'RGB', {'progressive': True}),
+    ('exif.jpg', 'RGB', {'progressive': True, 'exif': exif_with_orientation(),
+                         'icc_profile': bytes(70000)}),
+])
+@pytest.mark.parametrize('size', [(123, 45), (1, 1), (4000, 3)])
+def test_read_image_size_matches_pil(tmp_path, name, mode, params, size):
+    path = save_image(tmp_path / name, mode, size, **params)
+    with yolo_labeler.Image.open(path) as img:
+        expected = img.size
+    assert yolo_labeler.read_image_size(path) == expected == size
+
+
+def test_read_image_size_top_down_bmp(tmp_path):
+    path = save_image(tmp_path / 'image.bmp')
+    data = bytearray(path.read_bytes())
+    data[22:26] = (-45).to_bytes(4, 'little', signed=True)
+    path.write_bytes(bytes(data))
+    with yolo_labeler.Image.open(path) as img:
+        assert yolo_labeler.read_image_size(path) == img.size == (123, 45)
+
+
+def test_read_image_size_unsupported_or_broken(tmp_path):
+    assert yolo_labeler.read_image_size(save_image(tmp_path / 'image.tiff')) is None
+    
+    truncated = tmp_path / 'truncated.jpg'
+    truncated.write_bytes(save_image(tmp_path / 'full.jpg').read_bytes()[:100])
+    assert yolo_labeler.read_image_size(truncated) is None
+    
+    garbage = tmp_path / 'garbage.jpg'
+    garbage.write_bytes(b'\xff\xd8' + bytes(64))
+    assert yolo_labeler.read_image_size(garbage) is None
+    
+    empty = tmp_path / 'empty.png'
+    empty.write_bytes(b'')
+    assert yolo_labeler.read_image_size(empty) is None
+
+
+WIDGETS = ('canvas', 'info_label', 'image_counter_label', 'box_listbox', 'class_listbox',
+           'current_class_frame', 'current_class_label', 'prev_button', 'next_button',
+           'open_dir_button')
+
+
+@pytest.fixture
+def headless_labeler(monkeypatch):
+    """A YOLOLabeler whose Tk root, fonts and widgets are mocks"""
+    def setup_ui(labeler):
+        for name in WIDGETS:
+            setattr(labeler, name, mock.MagicMock(name=name))
+        labeler.canvas.winfo_width.return_value = 800
+        labeler.canvas.winfo_height.return_value = 600
+        labeler.canvas.bbox.return_value = (0, 0, 10, 10)
+    
+    monkeypatch.setattr(yolo_labeler, 'tkfont', mock.MagicMock())
+    monkeypatch.setattr(yolo_labeler.ImageTk, 'PhotoImage', mock.MagicMock())
+    monkeypatch.setattr(yolo_labeler.YOLOLabeler, 'setup_ui', setup_ui)
+    labeler = yolo_labeler.YOLOLabeler(mock.MagicMock(name='root'))
+    yield labeler
+    labeler._prefetch_pool.shutdown(wait=True)
+
+
+def test_open_directory_keys_are_the_image_paths(tmp_path, monkeypatch, headless_labeler):
+    images_dir = tmp_path / 'images'
+    labels_dir = tmp_path / 'labels'
+    images_dir.mkdir()
+    labels_dir.mkdir()
+    for name in ('b.png', 'a.JPG', 'c.bmp'):
+        save_image(images_dir / name, size=(100, 50))
+    (images_dir / 'notes.txt').write_text('not an image')
+    (labels_dir / 'a.txt').write_text('1 0.5 0.5 0.2 0.2\n')
+    (labels_dir / 'b.txt').write_text('0 0.25 0.5 0.1 0.1\n2 0.75 0.5 0.1 0.1\n')
+    (images_dir / 'classes.txt').write_text('person\ncar\nbicycle\n')
+    
+    monkeypatch.setattr(yolo_labeler.filedialog, 'askdirectory', lambda **kwargs: str(images_dir))
+    monkeypatch.setattr(yolo_labeler, 'messagebox', mock.MagicMock())
+    yolo_labeler.messagebox.askyesno.return_value = True
+    
+    labeler = headless_labeler
+    labeler.open_directory()
+    
+    yolo_labeler.messagebox.showerror.assert_not_called()
+    assert [path.name for path in labeler.image_files] == ['a.JPG', 'b.png', 'c.bmp']
+    
+    # Loaded annotations are keyed by the very Path objects in image_files
+    assert set(labeler.annotations) == set(labeler.image_files[:2])
+    for key in labeler.annotations:
+        assert any(key is image_path for image_path in labeler.image_files)
+    
+    # ...and so is the image being displayed, for every image
+    for index, image_path in enumerate(labeler.image_files):
+        labeler.current_index = index
+        labeler.display_current_image()
+        assert labeler._current_key is image_path
+        if image_path in labeler.annotations:
+            key = next(key for key in labeler.annotations if key == image_path)
+            assert key is labeler._current_key
+    
+    labeler.current_index = 1
+    labeler.display_current_image()
+    assert len(labeler.annotations[labeler._current_key]) == 2
+    yolo_labeler.messagebox.showerror.assert_not_called()
@@ -5,12 +5,263 @@ A simple GUI application for labeling images for YOLO model training
 """
 
 import os
+import json
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog, colorchooser
 from tkinter import font as tkfont
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image, ImageColor, ImageTk
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import queue
 import random
+import struct
+import threading
+import numpy as np
+
+import _boxops
+
+
+# Resize handle names, in the order corners are tested
+HANDLE_NAMES = ('tl', 'tr', 'bl', 'br')
+
+# Columns of an [x1, y1, x2, y2] box row each handle moves, as (x, y)
+HANDLE_COLUMNS = {'tl': (0, 1), 'tr': (2, 1), 'bl': (0, 3), 'br': (2, 3)}
+
+# Edits made within this window are coalesced into a single auto-save
+SAVE_DELAY_MS = 200
+
+# Format of a YOLO label line: class_id x_center y_center width height
+YOLO_LINE_FORMAT = "%d %.6f %.6f %.6f %.6f\n"
+
+# Number of decoded and scaled images kept for navigation
+IMAGE_CACHE_SIZE = 8
+
+# Threads writing label files during Save All
+SAVE_ALL_WORKERS = 4
+
+# Largest custom YOLO class ID for tables of up to 1000 classes; larger tables
+# may use IDs up to their class count. Keeps ClassTable's dense lookup small.
+MAX_CLASS_ID = 999
+
+# Colors of the first classes loaded from classes.txt; later ones get random colors
+DEFAULT_CLASS_COLORS = ('#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF',
+                        '#00FFFF', '#FF8800', '#8800FF', '#00FF88')
+
+# Class lists at least this long are colored with a single Tcl script
+BATCH_ITEMCONFIG_MIN = 16
+
+
+# Rec. 601 luma weights used to pick a contrasting label text color
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
+
+def max_class_id(class_count):
+    """Return the largest YOLO class ID allowed in a table of class_count classes"""
+    return max(MAX_CLASS_ID, class_count - 1)
+
+
+# JPEG start-of-frame markers, which carry the image dimensions
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def read_image_size(image_path):
+    """Read (width, height) from a PNG, GIF, BMP or JPEG header
+
+    Only the first bytes of the file are read (for JPEGs, the segments up to
+    the frame header). Returns None for other or unrecognized files.
+    """
+    with open(image_path, 'rb') as f:
+        head = f.read(26)
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head.startswith(b'BM') and len(head) == 26:
+            if struct.unpack('<I', head[14:18])[0] == 12:  # OS/2 BITMAPCOREHEADER
+                return struct.unpack('<HH', head[18:22])
+            width, height = struct.unpack('<ii', head[18:26])
+            return width, abs(height)  # negative height means top-down rows
+        if not head.startswith(b'\xff\xd8'):
+            return None
+        
+        # Walk the JPEG segments until a frame header
+        f.seek(2)
+        while True:
+            byte = f.read(1)
+            if byte != b'\xff':
+                return None
+            while byte == b'\xff':
+                byte = f.read(1)  # fill bytes before a marker
+            if not byte:
+                return None
+            marker = byte[0]
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                continue  # standalone markers without a length
+            segment = f.read(2)
+            if len(segment) < 2 or marker == 0xD9:
+                return None
+            length = struct.unpack('>H', segment)[0]
+            if marker in JPEG_SOF_MARKERS:
+                frame = f.read(5)
+                if len(frame) < 5:
+                    return None
+                height, width = struct.unpack('>HH', frame[1:5])
+                return width, height
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+class ImageAnnotations:
+    """Bounding boxes of a single image stored as parallel NumPy arrays
+
+    boxes holds one [x1, y1, x2, y2] row per box in integer pixel coordinates
+    and class_ids holds the internal class index of each row. Coordinates are
+    always clamped to the image, and int32 covers any image dimension.
+    """
+
+    def __init__(self, boxes=None, class_ids=None):
+        if boxes is None:
+            boxes = np.empty((0, 4), dtype=np.int32)
+        if class_ids is None:
+            class_ids = np.empty(0, dtype=np.int32)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def append(self, class_id, x1, y1, x2, y2):
+        """Add a box at the end (topmost position)"""
+        self.boxes = np.vstack([self.boxes, np.array([[x1, y1, x2, y2]], dtype=np.int32)])
+        self.class_ids = np.append(self.class_ids, np.int32(class_id))
+
+    def pop(self, index):
+        """Remove the box at index"""
+        self.boxes = np.delete(self.boxes, index, axis=0)
+        self.class_ids = np.delete(self.class_ids, index)
+
+    def clear(self):
+        """Remove all boxes"""
+        self.boxes = self.boxes[:0]
+        self.class_ids = self.class_ids[:0]
+
+    def remove_class(self, class_id):
+        """Drop boxes of a class and shift the indices of later classes down"""
+        keep = self.class_ids != class_id
+        self.boxes = self.boxes[keep]
+        self.class_ids = self.class_ids[keep]
+        self.class_ids[self.class_ids > class_id] -= 1
+
+    @classmethod
+    def from_dicts(cls, boxes):
+        """Build from a list of {class_id, x1, y1, x2, y2} dicts"""
+        return cls([[b['x1'], b['y1'], b['x2'], b['y2']] for b in boxes],
+                   [b['class_id'] for b in boxes])
+
+
+class ClassTable:
+    """Class definitions stored as parallel columns
+    
+    A class's position in the table is its internal class index (the value
+    stored per box). Names, packed 0xRRGGBB colors and YOLO IDs are kept in
+    separate columns; indexing or iterating the table yields class names.
+    The '#rrggbb' strings Tk needs are kept alongside the packed colors, and
+    label text colors are computed for all classes at once and cached until
+    the table changes.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.colors = np.empty(0, dtype=np.uint32)
+        self.hex_colors = []
+        self.ids = np.empty(0, dtype=np.int32)
+        self._text_colors = None  # 'white'/'black' per class, None when stale
+        self._index_lookup = None  # YOLO ID -> class index, None when stale
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __getitem__(self, index):
+        return self.names[index]
+
+    def add(self, name, color, yolo_id):
+        """Append a class with a '#rrggbb' color"""
+        packed = int(color.lstrip('#'), 16)
+        self.names.append(name)
+        self.colors = np.append(self.colors, np.uint32(packed))
+        self.hex_colors.append("#{:06x}".format(packed))
+        self.ids = np.append(self.ids, np.int32(yolo_id))
+        self._text_colors = None
+        self._index_lookup = None
+
+    def remove(self, index):
+        """Remove the class at index"""
+        self.names.pop(index)
+        self.colors = np.delete(self.colors, index)
+        self.hex_colors.pop(index)
+        self.ids = np.delete(self.ids, index)
+        self._text_colors = None
+        self._index_lookup = None
+
+    def clear(self):
+        """Remove all classes"""
+        self.names.clear()
+        self.colors = self.colors[:0]
+        self.hex_colors.clear()
+        self.ids = self.ids[:0]
+        self._text_colors = None
+        self._index_lookup = None
+
+    def color(self, index):
+        """Return the class color as a '#rrggbb' string"""
+        return self.hex_colors[index]
+
+    def rgb(self):
+        """Return the class colors as an (N, 3) uint8 array"""
+        shifts = np.array([16, 8, 0], dtype=np.uint32)
+        return ((self.colors[:, None] >> shifts) & 0xFF).astype(np.uint8)
+
+    def text_colors(self):
+        """Return 'white' or 'black' per class, whichever contrasts with its color"""
+        if self._text_colors is None:
+            dark = (self.rgb() @ LUMA_WEIGHTS) < 128
+            self._text_colors = ['white' if d else 'black' for d in dark.tolist()]
+        return self._text_colors
+
+    def text_color(self, index):
+        """Return 'white' or 'black', whichever contrasts with the class color"""
+        return self.text_colors()[index]
+
+    def yolo_id(self, index):
+        """Return the YOLO class ID written to label files"""
+        return int(self.ids[index])
+
+    def set_yolo_id(self, index, yolo_id):
+        self.ids[index] = yolo_id
+        self._index_lookup = None
+
+    def index_lookup(self):
+        """Return an int32 array mapping YOLO class ID to class index, -1 if unknown
+
+        IDs no class uses are taken as a class index directly, if in range,
+        so label files written before custom IDs still load.
+        """
+        if self._index_lookup is None:
+            count = len(self.names)
+            used = np.flatnonzero(self.ids >= 0)
+            size = max(count, int(self.ids[used].max()) + 1 if len(used) else 0)
+            lookup = np.full(size, -1, dtype=np.int32)
+            lookup[:count] = np.arange(count)
+            # Assign in reverse so the first class with a given ID wins
+            lookup[self.ids[used[::-1]]] = used[::-1]
+            self._index_lookup = lookup
+        return self._index_lookup
 
 
 class YOLOLabeler:
@@ -56,22 +307,27 @@ class YOLOLabeler:
             'button': (font_family, 9, 'bold'),
         }
         
+        # Box labels share one named font instead of Tk parsing the font
+        # description again for every label item created
+        self.label_font = tkfont.Font(root=self.root, family=font_family, size=9)
+        
         # Data structures
         self.image_dir = None
+        self._labels_dir = None  # (image_dir, labels_dir) of the last get_labels_dir
         self.image_files = []
         self.current_index = 0
-        self.current_image = None
+        self._current_key = None  # Path of the current image, its annotations key
+        self.current_image_size = None  # (width, height) of the full-size image
         self.photo = None
         
         # Supported image formats
         self.supported_formats = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff')
         
         # Classes and annotations
-        self.classes = []  # List of class names
-        self.class_colors = {}  # class_name -> color
-        self.class_ids = {}  # class_name -> custom YOLO ID
+        self.classes = ClassTable()  # class names, colors and custom YOLO IDs
         self.selected_class_index = None
-        self.annotations = {}  # image_path -> list of {class_id, x1, y1, x2, y2}
+        self._class_list_dirty = False  # a class list refresh is scheduled
+        self.annotations = {}  # image Path -> ImageAnnotations
         
         # Box editing state
         self.selected_box_index = None
@@ -91,11 +347,34 @@ class YOLOLabeler:
         
         # Image display properties
         self.display_scale = 1.0
+        self._inv_scale = 1.0  # 1 / display_scale, kept in sync in render_base
         self.display_offset_x = 0
         self.display_offset_y = 0
         self.display_width = 0
         self.display_height = 0
         
+        # Canvas render cache: the scaled base image is only rebuilt when the
+        # image or canvas size changes, boxes are drawn as canvas items on top
+        self._base_key = None  # (image_path, canvas_width, canvas_height)
+        self._box_item_ids = []  # per box: (rectangle, label background, label text)
+        self._handle_item_ids = []  # resize handle squares of the selected box
+        self._label_extents = {}  # class name -> label text bbox relative to its anchor
+        self._box_update_pending = False  # a dragged box redraw is scheduled
+        
+        # Neighbouring images are decoded and scaled ahead of time in worker
+        # threads; PhotoImages are still only created on the Tk thread
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=2)
+        self._img_cache = OrderedDict()  # (image_path, canvas_width, canvas_height) -> Future
+        self._image_sizes = {}  # image Path -> (width, height) of the full-size image
+        
+        # Auto-saves are written by a background thread so disk I/O never
+        # blocks the UI; edits are collected for SAVE_DELAY_MS before queuing
+        self._save_queue = queue.Queue()
+        self._pending_saves = set()
+        self._save_job = None
+        self._label_contents = {}  # txt_path -> (text, (mtime_ns, size)) last written or loaded
+        threading.Thread(target=self._save_worker, daemon=True).start()
+        
         # Initialize with some default classes
         self.add_class("person", "#FF0000", 0)
         self.add_class("car", "#00FF00", 1)
@@ -124,13 +403,15 @@ class YOLOLabeler:
         file_menu.add_command(label="Export Classes", command=self.export_classes)
         file_menu.add_command(label="Import Classes", command=self.import_classes)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self.on_close)
         
         help_menu = tk.Menu(menubar, tearoff=0, bg=self.colors['bg_secondary'], fg=self.colors['text_primary'],
                            activebackground=self.colors['bg_button'], activeforeground=self.colors['text_primary'])
         menubar.add_cascade(label="Help", menu=help_menu)
         help_menu.add_command(label="Keyboard Shortcuts", command=self.show_help)
         
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Main container
         main_frame = tk.Frame(self.root, bg=self.colors['bg_primary'])
         main_frame.pack(fill=tk.BOTH, expand=True, padx=12, pady=12)
@@ -357,9 +638,7 @@ class YOLOLabeler:
             # Auto-assign next available ID
             class_id = len(self.classes)
         
-        self.classes.append(class_name)
-        self.class_colors[class_name] = color
-        self.class_ids[class_name] = class_id
+        self.classes.add(class_name, color, class_id)
         
     def add_class_dialog(self):
         """Show dialog to add a new class"""
@@ -398,20 +677,13 @@ class YOLOLabeler:
                                    f"Delete class '{class_name}'?\nAll annotations with this class will be removed."):
             return
         
-        # Remove annotations with this class
+        # Remove annotations with this class and update class IDs for remaining boxes
         class_id = self.selected_class_index
-        for img_path in self.annotations:
-            self.annotations[img_path] = [box for box in self.annotations[img_path] 
-                                         if box['class_id'] != class_id]
-            # Update class IDs for remaining boxes
-            for box in self.annotations[img_path]:
-                if box['class_id'] > class_id:
-                    box['class_id'] -= 1
+        for boxes in self.annotations.values():
+            boxes.remove_class(class_id)
         
         # Remove class
-        del self.class_colors[class_name]
-        del self.class_ids[class_name]
-        self.classes.pop(self.selected_class_index)
+        self.classes.remove(self.selected_class_index)
         
         # Update selection
         if self.classes:
@@ -420,31 +692,38 @@ class YOLOLabeler:
             self.selected_class_index = None
         
         self.update_class_list()
-        self.display_current_image()
+        self.refresh_boxes()
         
     def update_class_list(self):
-        """Update the class list display"""
+        """Schedule a class list refresh; repeated calls are coalesced until idle"""
+        if not self._class_list_dirty:
+            self._class_list_dirty = True
+            self.root.after_idle(self.refresh_class_list)
+        
+    def refresh_class_list(self):
+        """Rebuild the class list display"""
+        self._class_list_dirty = False
         self.class_listbox.delete(0, tk.END)
-        for i, class_name in enumerate(self.classes):
-            color = self.class_colors[class_name]
-            class_id = self.class_ids[class_name]
-            self.class_listbox.insert(tk.END, f"  [{class_id}] {class_name}")
-            # Use class color with better contrast
-            text_color = 'white' if self.is_dark_color(color) else 'black'
-            self.class_listbox.itemconfig(i, bg=color, fg=text_color)
+        self.class_listbox.insert(tk.END, *(f"  [{self.classes.yolo_id(i)}] {class_name}"
+                                            for i, class_name in enumerate(self.classes)))
+        # Use class color with better contrast
+        colors = self.classes.hex_colors
+        text_colors = self.classes.text_colors()
+        if len(colors) >= BATCH_ITEMCONFIG_MIN:
+            # One Tcl evaluation instead of a round-trip per row
+            path = str(self.class_listbox)
+            self.class_listbox.tk.eval("\n".join(
+                f"{path} itemconfigure {i} -background {bg} -foreground {fg}"
+                for i, (bg, fg) in enumerate(zip(colors, text_colors))))
+        else:
+            for i, (bg, fg) in enumerate(zip(colors, text_colors)):
+                self.class_listbox.itemconfig(i, bg=bg, fg=fg)
         
         if self.selected_class_index is not None and self.selected_class_index < len(self.classes):
             self.class_listbox.selection_set(self.selected_class_index)
         
         self.update_current_class_label()
         
-    def is_dark_color(self, hex_color):
-        """Check if a color is dark (for text contrast)"""
-        hex_color = hex_color.lstrip('#')
-        r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        luminance = (0.299 * r + 0.587 * g + 0.114 * b)
-        return luminance < 128
-        
     def on_class_select(self, event):
         """Handle class selection"""
         selection = self.class_listbox.curselection()
@@ -456,7 +735,7 @@ class YOLOLabeler:
         """Update the current class label"""
         if self.selected_class_index is not None and self.selected_class_index < len(self.classes):
             class_name = self.classes[self.selected_class_index]
-            color = self.class_colors[class_name]
+            color = self.classes.color(self.selected_class_index)
             self.current_class_label.config(text=class_name, fg=color)
         else:
             self.current_class_label.config(text="None", fg=self.colors['text_muted'])
@@ -468,16 +747,16 @@ class YOLOLabeler:
             return
         
         class_name = self.classes[self.selected_class_index]
-        current_id = self.class_ids[class_name]
+        current_id = self.classes.yolo_id(self.selected_class_index)
         
         new_id = simpledialog.askinteger("Edit Class ID", 
                                          f"Enter YOLO ID for '{class_name}':\n(Current: {current_id})",
                                          initialvalue=current_id,
                                          minvalue=0,
-                                         maxvalue=999)
+                                         maxvalue=max_class_id(len(self.classes)))
         
         if new_id is not None:
-            self.class_ids[class_name] = new_id
+            self.classes.set_yolo_id(self.selected_class_index, new_id)
             self.update_class_list()
             messagebox.showinfo("Updated", f"Class '{class_name}' now has YOLO ID: {new_id}")
             
@@ -492,35 +771,37 @@ class YOLOLabeler:
             return
         
         # Check if clicking on an existing box
-        image_path = str(self.image_files[self.current_index])
+        image_path = self._current_key
         if image_path in self.annotations:
+            boxes = self.annotations[image_path].boxes
+            
             # Check for resize handle first (corners)
-            for idx, box in enumerate(self.annotations[image_path]):
-                handle = self.get_resize_handle(img_x, img_y, box)
-                if handle:
-                    self.resizing_box = True
-                    self.selected_box_index = idx
-                    self.resize_handle = handle
-                    self.drag_start_x = img_x
-                    self.drag_start_y = img_y
-                    self.original_box = box.copy()
-                    self.update_box_list()
-                    return
+            idx, handle = self.get_resize_handle(img_x, img_y, boxes)
+            if handle:
+                self.resizing_box = True
+                self.selected_box_index = idx
+                self.resize_handle = handle
+                self.drag_start_x = img_x
+                self.drag_start_y = img_y
+                self.original_box = boxes[idx].copy()
+                self.render_overlay()
+                self.update_box_list()
+                return
             
             # Check if clicking inside a box (for moving)
-            for idx, box in enumerate(self.annotations[image_path]):
-                if self.point_in_box(img_x, img_y, box):
-                    self.editing_box = True
-                    self.selected_box_index = idx
-                    self.drag_start_x = img_x
-                    self.drag_start_y = img_y
-                    self.original_box = box.copy()
-                    self.display_current_image()
-                    self.update_box_list()
-                    # Highlight the box in the listbox
-                    self.box_listbox.selection_clear(0, tk.END)
-                    self.box_listbox.selection_set(idx)
-                    return
+            idx = self.point_in_box(img_x, img_y, boxes)
+            if idx is not None:
+                self.editing_box = True
+                self.selected_box_index = idx
+                self.drag_start_x = img_x
+                self.drag_start_y = img_y
+                self.original_box = boxes[idx].copy()
+                self.render_overlay()
+                self.update_box_list()
+                # Highlight the box in the listbox
+                self.box_listbox.selection_clear(0, tk.END)
+                self.box_listbox.selection_set(idx)
+                return
         
         # Not clicking on a box, start drawing a new one
         if self.selected_class_index is None:
@@ -531,60 +812,54 @@ class YOLOLabeler:
         self.start_y = event.y
         self.selected_box_index = None
         
+        # Temporary rectangle, stretched by on_mouse_drag
+        if self.temp_rect:
+            self.canvas.delete(self.temp_rect)
+        color = self.classes.color(self.selected_class_index)
+        self.temp_rect = self.canvas.create_rectangle(
+            event.x, event.y, event.x, event.y,
+            outline=color, width=2, dash=(5, 5)
+        )
+        
     def on_mouse_drag(self, event):
         """Handle mouse drag"""
         img_x, img_y = self.screen_to_image_coords(event.x, event.y)
         if img_x is None:
             return
         
-        image_path = str(self.image_files[self.current_index])
+        image_path = self._current_key
         
         # Handle resizing
         if self.resizing_box and self.selected_box_index is not None:
             if image_path in self.annotations:
-                box = self.annotations[image_path][self.selected_box_index]
+                box = self.annotations[image_path].boxes[self.selected_box_index]
                 self.resize_box(box, img_x, img_y)
-                self.display_current_image()
+                self.schedule_box_update()
             return
         
         # Handle moving
         if self.editing_box and self.selected_box_index is not None:
             if image_path in self.annotations:
-                box = self.annotations[image_path][self.selected_box_index]
+                box = self.annotations[image_path].boxes[self.selected_box_index]
                 dx = img_x - self.drag_start_x
                 dy = img_y - self.drag_start_y
                 
-                # Move the box
-                box['x1'] = self.original_box['x1'] + dx
-                box['y1'] = self.original_box['y1'] + dy
-                box['x2'] = self.original_box['x2'] + dx
-                box['y2'] = self.original_box['y2'] + dy
-                
-                # Clamp to image bounds
-                img_width = self.current_image.width
-                img_height = self.current_image.height
-                box['x1'] = max(0, min(box['x1'], img_width - 1))
-                box['y1'] = max(0, min(box['y1'], img_height - 1))
-                box['x2'] = max(0, min(box['x2'], img_width - 1))
-                box['y2'] = max(0, min(box['y2'], img_height - 1))
+                # Move the box, clamped to image bounds
+                img_width, img_height = self.current_image_size
+                np.clip(self.original_box + (dx, dy, dx, dy), 0,
+                        (img_width - 1, img_height - 1, img_width - 1, img_height - 1),
+                        out=box)
                 
-                self.display_current_image()
+                self.schedule_box_update()
             return
         
         # Handle drawing new box
         if not self.drawing:
             return
         
-        # Remove previous temporary rectangle
+        # Stretch temporary rectangle
         if self.temp_rect:
-            self.canvas.delete(self.temp_rect)
-        
-        # Draw temporary rectangle
-        color = self.class_colors[self.classes[self.selected_class_index]]
-        self.temp_rect = self.canvas.create_rectangle(
-            self.start_x, self.start_y, event.x, event.y,
-            outline=color, width=2, dash=(5, 5)
-        )
+            self.canvas.coords(self.temp_rect, self.start_x, self.start_y, event.x, event.y)
         
     def on_mouse_up(self, event):
         """Handle mouse button release"""
@@ -595,7 +870,7 @@ class YOLOLabeler:
             self.original_box = None
             # Auto-save after resize
             if self.image_files:
-                self.save_annotation_for_image(self.image_files[self.current_index])
+                self.schedule_save(self.image_files[self.current_index])
             return
         
         # Handle end of moving
@@ -604,7 +879,7 @@ class YOLOLabeler:
             self.original_box = None
             # Auto-save after move
             if self.image_files:
-                self.save_annotation_for_image(self.image_files[self.current_index])
+                self.schedule_save(self.image_files[self.current_index])
             return
         
         # Handle end of drawing
@@ -634,24 +909,19 @@ class YOLOLabeler:
             return
         
         # Add annotation
-        image_path = str(self.image_files[self.current_index])
+        image_path = self._current_key
         if image_path not in self.annotations:
-            self.annotations[image_path] = []
+            self.annotations[image_path] = ImageAnnotations()
         
-        self.annotations[image_path].append({
-            'class_id': self.selected_class_index,
-            'x1': img_x1,
-            'y1': img_y1,
-            'x2': img_x2,
-            'y2': img_y2
-        })
+        self.annotations[image_path].append(self.selected_class_index,
+                                            img_x1, img_y1, img_x2, img_y2)
         
-        # Redraw image with annotations
-        self.display_current_image()
+        # Redraw boxes; the image itself is unchanged
+        self.refresh_boxes()
         
         # Auto-save annotation for current image
         if self.image_files:
-            self.save_annotation_for_image(self.image_files[self.current_index])
+            self.schedule_save(self.image_files[self.current_index])
         
     def cancel_drawing(self):
         """Cancel current drawing operation"""
@@ -670,7 +940,7 @@ class YOLOLabeler:
             self.canvas.delete(self.temp_rect)
             self.temp_rect = None
         self.box_listbox.selection_clear(0, tk.END)
-        self.display_current_image()
+        self.render_overlay()
     
     def select_class_by_index(self, index):
         """Select a class by its index (for keyboard shortcuts)"""
@@ -683,76 +953,60 @@ class YOLOLabeler:
         
     def screen_to_image_coords(self, screen_x, screen_y):
         """Convert screen coordinates to image coordinates"""
-        if not self.current_image:
+        image_size = self.current_image_size
+        if not image_size:
             return None, None
         
-        # Convert to image coordinates
-        img_x = int((screen_x - self.display_offset_x) / self.display_scale)
-        img_y = int((screen_y - self.display_offset_y) / self.display_scale)
+        # Convert to image coordinates (called on every mouse event, so
+        # multiply by the cached inverse scale instead of dividing)
+        inv_scale = self._inv_scale
+        img_x = int((screen_x - self.display_offset_x) * inv_scale)
+        img_y = int((screen_y - self.display_offset_y) * inv_scale)
         
         # Clamp to image bounds
-        img_x = max(0, min(img_x, self.current_image.width - 1))
-        img_y = max(0, min(img_y, self.current_image.height - 1))
+        img_x = max(0, min(img_x, image_size[0] - 1))
+        img_y = max(0, min(img_y, image_size[1] - 1))
         
         return img_x, img_y
         
     def image_to_screen_coords(self, img_x, img_y):
         """Convert image coordinates to screen coordinates"""
-        screen_x = int(img_x * self.display_scale + self.display_offset_x)
-        screen_y = int(img_y * self.display_scale + self.display_offset_y)
+        scale = self.display_scale
+        screen_x = int(img_x * scale + self.display_offset_x)
+        screen_y = int(img_y * scale + self.display_offset_y)
         return screen_x, screen_y
     
-    def point_in_box(self, x, y, box):
-        """Check if a point is inside a bounding box"""
-        return box['x1'] <= x <= box['x2'] and box['y1'] <= y <= box['y2']
+    def point_in_box(self, x, y, boxes):
+        """Return the index of the first box containing the point, or None"""
+        box_index = _boxops.box_at(boxes, x, y)
+        return None if box_index < 0 else box_index
     
-    def get_resize_handle(self, x, y, box):
-        """Check if point is near a corner (resize handle) of the box"""
-        # Define handle size (in image coordinates)
-        handle_size = max(10, int(15 / self.display_scale))  # Scale handle size
-        
-        x1, y1, x2, y2 = box['x1'], box['y1'], box['x2'], box['y2']
+    def get_resize_handle(self, x, y, boxes):
+        """Find the first box with a corner (resize handle) near the point
         
-        # Check corners
-        if abs(x - x1) <= handle_size and abs(y - y1) <= handle_size:
-            return 'tl'  # top-left
-        if abs(x - x2) <= handle_size and abs(y - y1) <= handle_size:
-            return 'tr'  # top-right
-        if abs(x - x1) <= handle_size and abs(y - y2) <= handle_size:
-            return 'bl'  # bottom-left
-        if abs(x - x2) <= handle_size and abs(y - y2) <= handle_size:
-            return 'br'  # bottom-right
+        Returns (box_index, handle) or (None, None)
+        """
+        # Define handle size (in image coordinates)
+        handle_size = max(10, int(15 * self._inv_scale))  # Scale handle size
         
-        return None
+        box_index, corner = _boxops.handle_at(boxes, x, y, handle_size)
+        if box_index < 0:
+            return None, None
+        return box_index, HANDLE_NAMES[corner]
     
     def resize_box(self, box, new_x, new_y):
-        """Resize box based on the resize handle being dragged"""
-        if self.resize_handle == 'tl':
-            box['x1'] = new_x
-            box['y1'] = new_y
-        elif self.resize_handle == 'tr':
-            box['x2'] = new_x
-            box['y1'] = new_y
-        elif self.resize_handle == 'bl':
-            box['x1'] = new_x
-            box['y2'] = new_y
-        elif self.resize_handle == 'br':
-            box['x2'] = new_x
-            box['y2'] = new_y
-        
-        # Ensure x1 < x2 and y1 < y2
-        if box['x1'] > box['x2']:
-            box['x1'], box['x2'] = box['x2'], box['x1']
-        if box['y1'] > box['y2']:
-            box['y1'], box['y2'] = box['y2'], box['y1']
-        
-        # Clamp to image bounds
-        img_width = self.current_image.width
-        img_height = self.current_image.height
-        box['x1'] = max(0, min(box['x1'], img_width - 1))
-        box['y1'] = max(0, min(box['y1'], img_height - 1))
-        box['x2'] = max(0, min(box['x2'], img_width - 1))
-        box['y2'] = max(0, min(box['y2'], img_height - 1))
+        """Resize box ([x1, y1, x2, y2] array row) based on the resize handle being dragged"""
+        coords = box.tolist()
+        x_col, y_col = HANDLE_COLUMNS[self.resize_handle]
+        coords[x_col] = new_x
+        coords[y_col] = new_y
+        x1, y1, x2, y2 = coords
+        
+        # Ensure x1 < x2 and y1 < y2, then clamp to image bounds
+        max_x = self.current_image_size[0] - 1
+        max_y = self.current_image_size[1] - 1
+        box[:] = (max(0, min(x1, x2, max_x)), max(0, min(y1, y2, max_y)),
+                  max(0, min(max(x1, x2), max_x)), max(0, min(max(y1, y2), max_y)))
         
     def delete_selected_box(self):
         """Delete the selected bounding box"""
@@ -761,15 +1015,15 @@ class YOLOLabeler:
             return
         
         box_index = selection[0]
-        image_path = str(self.image_files[self.current_index])
+        image_path = self._current_key
         
         if image_path in self.annotations and box_index < len(self.annotations[image_path]):
             self.annotations[image_path].pop(box_index)
-            self.display_current_image()
+            self.refresh_boxes()
             
             # Auto-save after deletion
             if self.image_files and self.image_dir:
-                self.save_annotation_for_image(self.image_files[self.current_index])
+                self.schedule_save(self.image_files[self.current_index])
             
     def clear_all_boxes(self):
         """Clear all bounding boxes for current image"""
@@ -780,14 +1034,14 @@ class YOLOLabeler:
                                    "Clear all bounding boxes for this image?"):
             return
         
-        image_path = str(self.image_files[self.current_index])
+        image_path = self._current_key
         if image_path in self.annotations:
-            self.annotations[image_path] = []
-            self.display_current_image()
+            self.annotations[image_path].clear()
+            self.refresh_boxes()
             
             # Auto-save after clearing
             if self.image_files and self.image_dir:
-                self.save_annotation_for_image(self.image_files[self.current_index])
+                self.schedule_save(self.image_files[self.current_index])
             
     def update_box_list(self):
         """Update the bounding box list"""
@@ -796,15 +1050,16 @@ class YOLOLabeler:
         if not self.image_files:
             return
         
-        image_path = str(self.image_files[self.current_index])
+        image_path = self._current_key
         if image_path not in self.annotations:
             return
         
-        for i, box in enumerate(self.annotations[image_path]):
-            class_name = self.classes[box['class_id']]
+        names = self.classes.names
+        colors = self.classes.hex_colors
+        for i, class_id in enumerate(self.annotations[image_path].class_ids.tolist()):
+            class_name = names[class_id]
             self.box_listbox.insert(tk.END, f"{i+1}. {class_name}")
-            color = self.class_colors[class_name]
-            self.box_listbox.itemconfig(i, fg=color)
+            self.box_listbox.itemconfig(i, fg=colors[class_id])
     
     def open_directory(self):
         """Open a directory containing images"""
@@ -812,50 +1067,48 @@ class YOLOLabeler:
         
         if not directory:
             return
+        
+        # Finish writing labels of the previous directory
+        self.flush_saves()
             
         self.image_dir = Path(directory)
+        self._labels_dir = None
         
-        # Check for classes.txt file
-        classes_file = self.image_dir / 'classes.txt'
-        if classes_file.exists():
+        # Images and labels may have changed on disk since they were cached
+        self.clear_image_cache()
+        self._label_contents.clear()
+        
+        # Check for a classes file
+        classes_file = self.find_classes_file()
+        classes_failed = False
+        if classes_file:
             response = messagebox.askyesno("Classes File Found", 
-                                          "Found classes.txt in directory.\nLoad class definitions?")
+                                          f"Found {classes_file.name} in directory.\nLoad class definitions?")
             if response:
                 try:
-                    with open(classes_file, 'r') as f:
-                        lines = f.readlines()
+                    class_defs = self.read_class_definitions(classes_file)
                     
                     # Clear existing classes
                     self.classes.clear()
-                    self.class_colors.clear()
-                    self.class_ids.clear()
                     self.annotations.clear()
                     
                     # Load new classes
-                    colors = ['#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF', 
-                             '#00FFFF', '#FF8800', '#8800FF', '#00FF88']
-                    
-                    for i, line in enumerate(lines):
-                        class_name = line.strip()
-                        if class_name:
-                            color = colors[i % len(colors)] if i < len(colors) else \
-                                   "#{:06x}".format(random.randint(0, 0xFFFFFF))
-                            # Use line index as YOLO ID (standard YOLO format)
-                            self.add_class(class_name, color, i)
+                    for class_name, color, class_id in class_defs:
+                        self.add_class(class_name, color, class_id)
                     
                     self.selected_class_index = 0 if self.classes else None
                     self.update_class_list()
                 except Exception as e:
+                    classes_failed = True
                     messagebox.showerror("Error Loading Classes", str(e))
         
-        # Find all image files in the directory
-        self.image_files = []
-        for ext in self.supported_formats:
-            self.image_files.extend(sorted(self.image_dir.glob(f'*{ext}')))
-            self.image_files.extend(sorted(self.image_dir.glob(f'*{ext.upper()}')))
-        
-        # Remove duplicates and sort
-        self.image_files = sorted(list(set(self.image_files)))
+        # Find all image files in the directory, matching extensions in any case
+        with os.scandir(self.image_dir) as entries:
+            self.image_files = sorted(
+                Path(entry.path) for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in self.supported_formats
+                and entry.is_file()
+            )
         
         if not self.image_files:
             messagebox.showwarning("No Images", 
@@ -869,36 +1122,29 @@ class YOLOLabeler:
         self.info_label.config(text=f"Images: {self.image_dir.name} | Labels: {labels_path}")
         
         # Try to load existing annotations from labels directory
-        annotations_found = False
-        labels_dir = self.get_labels_dir()
-        if labels_dir:
-            for image_path in self.image_files:
-                txt_filename = image_path.stem + '.txt'
-                txt_path = labels_dir / txt_filename
-                if txt_path.exists():
-                    annotations_found = True
-                    break
+        label_stems = self.list_label_stems()
+        annotations_found = not label_stems.isdisjoint(image_path.stem
+                                                       for image_path in self.image_files)
         
-        if annotations_found and self.classes:
+        # Labels read against the wrong class table would lose boxes on the next save
+        if annotations_found and self.classes and not classes_failed:
             response = messagebox.askyesno("Annotations Found", 
                                           "Found existing annotation files.\nLoad annotations?")
             if response:
                 loaded_count = 0
                 for image_path in self.image_files:
-                    self.load_annotation_for_image(image_path)
-                    if str(image_path) in self.annotations and self.annotations[str(image_path)]:
+                    self.load_annotation_for_image(image_path, label_stems)
+                    if image_path in self.annotations and self.annotations[image_path]:
                         loaded_count += 1
                 
                 messagebox.showinfo("Load Complete", 
                                   f"Found {len(self.image_files)} images\n" +
                                   f"Loaded annotations for {loaded_count} images")
             else:
-                labels_dir = self.get_labels_dir()
                 messagebox.showinfo("Images Loaded", 
                               f"Found {len(self.image_files)} images\n\n" +
                               f"Labels will be saved to:\n{labels_dir}")
         else:
-            labels_dir = self.get_labels_dir()
             messagebox.showinfo("Images Loaded", 
                               f"Found {len(self.image_files)} images\n\n" +
                               f"Labels will be saved to:\n{labels_dir}")
@@ -913,11 +1159,9 @@ class YOLOLabeler:
             return
             
         image_path = self.image_files[self.current_index]
+        self._current_key = image_path
         
         try:
-            # Load and display the image
-            self.current_image = Image.open(image_path)
-            
             # Get canvas dimensions
             canvas_width = self.canvas.winfo_width()
             canvas_height = self.canvas.winfo_height()
@@ -928,97 +1172,253 @@ class YOLOLabeler:
             if canvas_height <= 1:
                 canvas_height = 600
             
+            self.render_base(image_path, canvas_width, canvas_height)
+            self.render_overlay()
+            self.prefetch_neighbors(canvas_width, canvas_height)
+            
+            # Update counter
+            self.image_counter_label.config(
+                text=f"{self.current_index + 1} / {len(self.image_files)} - {image_path.name}"
+            )
+            
+            # Update box list
+            self.update_box_list()
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load image: {str(e)}")
+    
+    def render_base(self, image_path, canvas_width, canvas_height):
+        """Load, scale and show the image itself, unless it is already on the canvas"""
+        base_key = (image_path, canvas_width, canvas_height)
+        if base_key == self._base_key:
+            return
+        
+        # Use the prefetched image if there is one (waiting for it if it is
+        # still being decoded), otherwise decode it right here
+        future = self._img_cache.get(base_key)
+        if future is None:
+            future = Future()
+            future.set_result(self.load_display_image(image_path, canvas_width, canvas_height))
+            self.add_to_image_cache(base_key, future)
+        else:
+            self._img_cache.move_to_end(base_key)
+        
+        try:
+            resized_image, self.current_image_size, scale = future.result()
+        except Exception:
+            # Don't keep failed decodes around
+            self._img_cache.pop(base_key, None)
+            raise
+        self._image_sizes[image_path] = self.current_image_size
+        new_width, new_height = resized_image.size
+        
+        # Store display properties for coordinate conversion
+        self.display_scale = scale
+        self._inv_scale = 1.0 / scale
+        self.display_width = new_width
+        self.display_height = new_height
+        self.display_offset_x = (canvas_width - new_width) // 2
+        self.display_offset_y = (canvas_height - new_height) // 2
+        
+        self.photo = ImageTk.PhotoImage(resized_image)
+        
+        # Clear canvas and display image
+        self.canvas.delete("all")
+        self._box_item_ids = []
+        self._handle_item_ids = []
+        x = self.display_offset_x + new_width // 2
+        y = self.display_offset_y + new_height // 2
+        self.canvas.create_image(x, y, image=self.photo, anchor=tk.CENTER)
+        self._base_key = base_key
+    
+    def add_to_image_cache(self, key, future):
+        """Store a (pending) decoded image, evicting the least recently used ones"""
+        self._img_cache[key] = future
+        while len(self._img_cache) > IMAGE_CACHE_SIZE:
+            self._img_cache.popitem(last=False)
+    
+    def clear_image_cache(self):
+        """Drop all decoded images and known sizes, cancelling prefetches that haven't started"""
+        for future in self._img_cache.values():
+            future.cancel()
+        self._img_cache.clear()
+        self._image_sizes.clear()
+        self._base_key = None
+    
+    def prefetch_neighbors(self, canvas_width, canvas_height):
+        """Decode the previous and next image while the user works on this one"""
+        for index in (self.current_index + 1, self.current_index - 1):
+            if 0 <= index < len(self.image_files):
+                image_path = self.image_files[index]
+                key = (image_path, canvas_width, canvas_height)
+                if key not in self._img_cache:
+                    try:
+                        future = self._prefetch_pool.submit(self.load_display_image, image_path,
+                                                            canvas_width, canvas_height)
+                    except RuntimeError:
+                        # The pool is shut down while the window closes
+                        return
+                    self.add_to_image_cache(key, future)
+    
+    def load_display_image(self, image_path, canvas_width, canvas_height):
+        """Decode an image scaled to fit the canvas
+        
+        Returns (scaled_image, (full_width, full_height), scale). Runs in
+        prefetch worker threads, so it must not touch Tk or shared state.
+        """
+        with Image.open(image_path) as image:
+            # Only the header has been read so far
+            img_width, img_height = image.size
+            
             # Calculate scaling to fit image in canvas while maintaining aspect ratio
-            img_width, img_height = self.current_image.size
             scale_w = canvas_width / img_width
             scale_h = canvas_height / img_height
             scale = min(scale_w, scale_h, 1.0)  # Don't scale up
             
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
+            new_width = max(1, int(img_width * scale))
+            new_height = max(1, int(img_height * scale))
             
-            # Store display properties for coordinate conversion
-            self.display_scale = scale
-            self.display_width = new_width
-            self.display_height = new_height
-            self.display_offset_x = (canvas_width - new_width) // 2
-            self.display_offset_y = (canvas_height - new_height) // 2
+            # JPEGs can be decoded directly at a reduced size
+            image.draft(None, (new_width, new_height))
             
-            # Create a copy of the image to draw bounding boxes on
-            display_image = self.current_image.copy()
-            draw = ImageDraw.Draw(display_image)
+            # Large downscales go through a cheap integer box reduce first, the
+            # bilinear resize then only covers the remaining factor (< 2x)
+            resized_image = image
+            reduce_factor = min(image.width // new_width, image.height // new_height)
+            if reduce_factor >= 2:
+                try:
+                    resized_image = resized_image.reduce(reduce_factor)
+                except ValueError:
+                    pass  # modes reduce() can't handle ('1', 'P', 'I;16*'), resize does it all
+            if resized_image.size != (new_width, new_height):
+                resized_image = resized_image.resize((new_width, new_height),
+                                                     Image.Resampling.BILINEAR)
             
-            # Draw existing bounding boxes
-            img_path_str = str(image_path)
-            if img_path_str in self.annotations:
-                for idx, box in enumerate(self.annotations[img_path_str]):
-                    class_name = self.classes[box['class_id']]
-                    color = self.class_colors[class_name]
-                    
-                    # Use thicker outline for selected box
-                    width = 5 if idx == self.selected_box_index else 3
-                    
-                    # Draw rectangle
-                    coords = [(box['x1'], box['y1']), (box['x2'], box['y2'])]
-                    draw.rectangle(coords, outline=color, width=width)
-                    
-                    # Draw resize handles for selected box
-                    if idx == self.selected_box_index:
-                        handle_size = 8
-                        # Top-left
-                        draw.rectangle([box['x1'] - handle_size, box['y1'] - handle_size, 
-                                      box['x1'] + handle_size, box['y1'] + handle_size], 
-                                     fill=color, outline='white', width=2)
-                        # Top-right
-                        draw.rectangle([box['x2'] - handle_size, box['y1'] - handle_size,
-                                      box['x2'] + handle_size, box['y1'] + handle_size],
-                                     fill=color, outline='white', width=2)
-                        # Bottom-left
-                        draw.rectangle([box['x1'] - handle_size, box['y2'] - handle_size,
-                                      box['x1'] + handle_size, box['y2'] + handle_size],
-                                     fill=color, outline='white', width=2)
-                        # Bottom-right
-                        draw.rectangle([box['x2'] - handle_size, box['y2'] - handle_size,
-                                      box['x2'] + handle_size, box['y2'] + handle_size],
-                                     fill=color, outline='white', width=2)
-                    
-                    # Draw label background and text
-                    label = class_name
-                    # Use a default font size
-                    bbox = draw.textbbox((box['x1'], box['y1'] - 20), label)
-                    draw.rectangle([bbox[0] - 2, bbox[1] - 2, bbox[2] + 2, bbox[3] + 2], 
-                                 fill=color)
-                    text_color = 'white' if self.is_dark_color(color) else 'black'
-                    draw.text((box['x1'], box['y1'] - 20), label, fill=text_color)
+            # Give ImageTk a mode it can paste as-is, so any conversion copy is
+            # made once here at display size instead of inside the Tk bridge
+            if resized_image.mode not in ('L', 'RGB', 'RGBA'):
+                has_alpha = resized_image.mode.endswith('A') or 'transparency' in resized_image.info
+                resized_image = resized_image.convert('RGBA' if has_alpha else 'RGB')
             
-            # Resize image with annotations
-            resized_image = display_image.resize((new_width, new_height), 
-                                                 Image.Resampling.LANCZOS)
-            self.photo = ImageTk.PhotoImage(resized_image)
+            # Read the pixels before the file is closed
+            resized_image.load()
+        
+        return resized_image, (img_width, img_height), scale
+    
+    def get_image_size(self, image_path):
+        """Return an image's (width, height), reading only its header the first time"""
+        size = self._image_sizes.get(image_path)
+        if size is None:
+            size = read_image_size(image_path)
+            if size is None:
+                # Formats without a parser here, e.g. TIFF
+                with Image.open(image_path) as img:
+                    size = img.size
+            self._image_sizes[image_path] = size
+        return size
+    
+    def render_overlay(self):
+        """Redraw the bounding boxes of the current image as canvas items"""
+        self.canvas.delete("overlay")
+        self._box_item_ids = []
+        self._handle_item_ids = []
+        
+        if not self.image_files:
+            return
+        
+        image_path = self._current_key
+        if image_path not in self.annotations:
+            return
+        
+        boxes = self.annotations[image_path]
+        names = self.classes.names
+        colors = self.classes.hex_colors
+        text_colors = self.classes.text_colors()
+        for idx, class_id in enumerate(boxes.class_ids.tolist()):
+            class_name = names[class_id]
+            color = colors[class_id]
+            text_color = text_colors[class_id]
             
-            # Clear canvas and display image
-            self.canvas.delete("all")
-            x = self.display_offset_x + new_width // 2
-            y = self.display_offset_y + new_height // 2
-            self.canvas.create_image(x, y, image=self.photo, anchor=tk.CENTER)
+            # Use thicker outline for selected box
+            width = 3 if idx == self.selected_box_index else 2
             
-            # Update counter
-            self.image_counter_label.config(
-                text=f"{self.current_index + 1} / {len(self.image_files)} - {image_path.name}"
-            )
+            rect = self.canvas.create_rectangle(0, 0, 0, 0, outline=color, width=width,
+                                                tags="overlay")
+            label_bg = self.canvas.create_rectangle(0, 0, 0, 0, fill=color, outline=color,
+                                                    tags="overlay")
+            label_text = self.canvas.create_text(0, 0, text=class_name, fill=text_color,
+                                                 font=self.label_font, anchor=tk.SW,
+                                                 tags="overlay")
+            self._box_item_ids.append((rect, label_bg, label_text))
             
-            # Update box list
-            self.update_box_list()
+            # Draw resize handles for selected box
+            if idx == self.selected_box_index:
+                self._handle_item_ids = [
+                    self.canvas.create_rectangle(0, 0, 0, 0, fill=color, outline='white',
+                                                 width=2, tags="overlay")
+                    for _ in HANDLE_NAMES
+                ]
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load image: {str(e)}")
+            self.update_box_items(idx)
+    
+    def refresh_boxes(self):
+        """Redraw the boxes and box list after annotations change, keeping the image"""
+        self.render_overlay()
+        self.update_box_list()
+    
+    def schedule_box_update(self):
+        """Schedule a redraw of the dragged box; motion events are coalesced until idle"""
+        if not self._box_update_pending:
+            self._box_update_pending = True
+            self.root.after_idle(self.flush_box_update)
+    
+    def flush_box_update(self):
+        """Move the selected box's canvas items to where the drag left it"""
+        self._box_update_pending = False
+        if self.selected_box_index is not None:
+            self.update_box_items(self.selected_box_index)
+    
+    def update_box_items(self, idx):
+        """Move the canvas items of one box to its current coordinates"""
+        if idx >= len(self._box_item_ids):
+            return
+        
+        annotations = self.annotations[self._current_key]
+        x1, y1, x2, y2 = annotations.boxes[idx].tolist()
+        sx1, sy1 = self.image_to_screen_coords(x1, y1)
+        sx2, sy2 = self.image_to_screen_coords(x2, y2)
+        
+        rect, label_bg, label_text = self._box_item_ids[idx]
+        self.canvas.coords(rect, sx1, sy1, sx2, sy2)
+        
+        # Label sits just above the top-left corner
+        tx, ty = sx1 + 2, sy1 - 2
+        self.canvas.coords(label_text, tx, ty)
+        
+        # The label's extent only depends on its text, so it is measured once
+        # per class name rather than on every update
+        class_name = self.classes.names[annotations.class_ids[idx]]
+        extent = self._label_extents.get(class_name)
+        if extent is None:
+            bx1, by1, bx2, by2 = self.canvas.bbox(label_text)
+            extent = (bx1 - tx, by1 - ty, bx2 - tx, by2 - ty)
+            self._label_extents[class_name] = extent
+        ex1, ey1, ex2, ey2 = extent
+        self.canvas.coords(label_bg, tx + ex1 - 2, ty + ey1, tx + ex2 + 2, ty + ey2)
+        
+        if idx == self.selected_box_index and self._handle_item_ids:
+            handle_size = 5
+            corners = ((sx1, sy1), (sx2, sy1), (sx1, sy2), (sx2, sy2))
+            for handle, (cx, cy) in zip(self._handle_item_ids, corners):
+                self.canvas.coords(handle, cx - handle_size, cy - handle_size,
+                                   cx + handle_size, cy + handle_size)
             
     def next_image(self):
         """Display the next image"""
         if self.current_index < len(self.image_files) - 1:
             # Save current image annotations before moving
             if self.image_files and self.image_dir:
-                self.save_annotation_for_image(self.image_files[self.current_index])
+                self.schedule_save(self.image_files[self.current_index])
             
             self.current_index += 1
             self.display_current_image()
@@ -1029,7 +1429,7 @@ class YOLOLabeler:
         if self.current_index > 0:
             # Save current image annotations before moving
             if self.image_files and self.image_dir:
-                self.save_annotation_for_image(self.image_files[self.current_index])
+                self.schedule_save(self.image_files[self.current_index])
             
             self.current_index -= 1
             self.display_current_image()
@@ -1054,34 +1454,37 @@ class YOLOLabeler:
         else:
             self.next_button.config(state=tk.DISABLED)
     
-    def box_to_yolo_format(self, box, image_width, image_height):
-        """Convert bounding box to YOLO format (normalized center coordinates)"""
-        # Get box coordinates
-        x1, y1, x2, y2 = box['x1'], box['y1'], box['x2'], box['y2']
-        
-        # Calculate center, width, height
-        x_center = (x1 + x2) / 2.0
-        y_center = (y1 + y2) / 2.0
-        width = abs(x2 - x1)
-        height = abs(y2 - y1)
-        
-        # Normalize by image dimensions
-        x_center_norm = x_center / image_width
-        y_center_norm = y_center / image_height
-        width_norm = width / image_width
-        height_norm = height / image_height
+    def boxes_to_yolo_format(self, boxes, yolo_class_ids, image_width, image_height):
+        """Convert (N, 4) [x1, y1, x2, y2] boxes to YOLO format rows
+        
+        Returns an (N, 5) array of [class_id, x_center, y_center, width, height]
+        with coordinates normalized to [0, 1]
+        """
+        boxes = boxes.astype(np.float64)
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        
+        # Calculate center, width, height and normalize by image dimensions
+        yolo = np.column_stack([
+            yolo_class_ids,
+            (x1 + x2) / (2.0 * image_width),
+            (y1 + y2) / (2.0 * image_height),
+            np.abs(x2 - x1) / image_width,
+            np.abs(y2 - y1) / image_height,
+        ])
         
         # Clamp values to [0, 1]
-        x_center_norm = max(0.0, min(1.0, x_center_norm))
-        y_center_norm = max(0.0, min(1.0, y_center_norm))
-        width_norm = max(0.0, min(1.0, width_norm))
-        height_norm = max(0.0, min(1.0, height_norm))
-        
-        # Use custom class ID instead of class index
-        class_name = self.classes[box['class_id']]
-        yolo_class_id = self.class_ids[class_name]
-        
-        return f"{yolo_class_id} {x_center_norm:.6f} {y_center_norm:.6f} {width_norm:.6f} {height_norm:.6f}"
+        np.clip(yolo[:, 1:], 0.0, 1.0, out=yolo[:, 1:])
+        return yolo
+    
+    def yolo_rows_to_annotations(self, rows, image_width, image_height):
+        """Convert an (N, 5) array of YOLO rows to ImageAnnotations
+        
+        Rows are skipped for the same reasons yolo_to_box skips a line:
+        non-numeric values, non-integer or unknown class IDs.
+        """
+        boxes, class_ids = _boxops.yolo_rows_to_boxes(rows, self.classes.index_lookup(),
+                                                      image_width, image_height)
+        return ImageAnnotations(boxes, class_ids)
     
     def yolo_to_box(self, yolo_line, image_width, image_height):
         """Convert YOLO format line to bounding box coordinates"""
@@ -1096,19 +1499,12 @@ class YOLOLabeler:
             width_norm = float(parts[3])
             height_norm = float(parts[4])
             
-            # Map YOLO class ID to internal class index
-            class_index = None
-            for idx, class_name in enumerate(self.classes):
-                if self.class_ids[class_name] == yolo_class_id:
-                    class_index = idx
-                    break
-            
-            # If class ID not found in our mapping, try to use it as direct index
-            if class_index is None:
-                if 0 <= yolo_class_id < len(self.classes):
-                    class_index = yolo_class_id
-                else:
-                    return None  # Skip boxes with unknown class IDs
+            # Map YOLO class ID to internal class index, falling back to
+            # using it as a direct index (see ClassTable.index_lookup)
+            lookup = self.classes.index_lookup()
+            if not 0 <= yolo_class_id < len(lookup) or lookup[yolo_class_id] < 0:
+                return None  # Skip boxes with unknown class IDs
+            class_index = int(lookup[yolo_class_id])
             
             # Denormalize coordinates
             x_center = x_center_norm * image_width
@@ -1143,6 +1539,10 @@ class YOLOLabeler:
         if not self.image_dir:
             return None
         
+        # The directory is created once per opened image directory
+        if self._labels_dir and self._labels_dir[0] == self.image_dir:
+            return self._labels_dir[1]
+        
         # Check if we're in an 'images' directory - if so, use parallel 'labels' dir
         if self.image_dir.name == 'images' or 'images' in str(self.image_dir):
             # Navigate up and create labels directory
@@ -1154,51 +1554,121 @@ class YOLOLabeler:
         
         # Create directory if it doesn't exist
         labels_dir.mkdir(parents=True, exist_ok=True)
+        self._labels_dir = (self.image_dir, labels_dir)
         return labels_dir
     
-    def save_annotation_for_image(self, image_path):
-        """Save annotation for a single image in YOLO format"""
-        if not self.image_dir:
-            return
+    def snapshot_annotation(self, image_path):
+        """Capture everything needed to write an image's label file
         
-        image_path_str = str(image_path)
+        Returns (image_path, txt_path, boxes, yolo_class_ids) with copied
+        arrays, so the file can be written off the UI thread, or None
+        """
+        if not self.image_dir:
+            return None
         
         # Get labels directory
         labels_dir = self.get_labels_dir()
         if not labels_dir:
-            return
+            return None
         
         # Get annotation file path in labels directory
         txt_filename = image_path.stem + '.txt'
         txt_path = labels_dir / txt_filename
         
+        if image_path not in self.annotations:
+            return image_path, txt_path, np.empty((0, 4), dtype=np.int32), []
+        
+        # Use custom class IDs instead of class indices
+        boxes = self.annotations[image_path]
+        yolo_class_ids = self.classes.ids[boxes.class_ids].tolist()
+        return image_path, txt_path, boxes.boxes.copy(), yolo_class_ids
+    
+    def label_file_state(self, txt_path):
+        """Return (mtime_ns, size) of a label file, or None if it doesn't exist"""
+        try:
+            stat = os.stat(txt_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def write_annotation_file(self, image_path, txt_path, boxes, yolo_class_ids, force=False):
+        """Write a label file captured by snapshot_annotation
+        
+        Unless force is set, the write is skipped when the file still holds
+        exactly the text this app last wrote or loaded.
+        """
         # If no annotations, remove the txt file if it exists
-        if image_path_str not in self.annotations or not self.annotations[image_path_str]:
+        if not len(boxes):
+            self._label_contents.pop(txt_path, None)
             if txt_path.exists():
                 txt_path.unlink()
             return
         
         # Load image to get dimensions
         try:
-            with Image.open(image_path) as img:
-                img_width, img_height = img.size
+            img_width, img_height = self.get_image_size(image_path)
         except Exception as e:
             print(f"Error loading image {image_path}: {e}")
             return
         
         # Convert annotations to YOLO format
-        yolo_lines = []
-        for box in self.annotations[image_path_str]:
-            yolo_line = self.box_to_yolo_format(box, img_width, img_height)
-            yolo_lines.append(yolo_line)
+        yolo = self.boxes_to_yolo_format(boxes, yolo_class_ids, img_width, img_height)
+        
+        # One format operation for the whole file instead of one per row
+        text = (YOLO_LINE_FORMAT * len(yolo)) % tuple(yolo.ravel().tolist())
+        
+        # Skip the write when the file already holds exactly these labels,
+        # e.g. auto-saves on navigation or a move that ended where it started.
+        # The file's mtime and size catch edits or deletes made outside the app.
+        if not force:
+            if self._label_contents.get(txt_path) == (text, self.label_file_state(txt_path)):
+                return
         
         # Write to file
         try:
             with open(txt_path, 'w') as f:
-                f.write('\n'.join(yolo_lines))
+                f.write(text)
+            self._label_contents[txt_path] = (text, self.label_file_state(txt_path))
         except Exception as e:
             print(f"Error saving annotation file {txt_path}: {e}")
     
+    def schedule_save(self, image_path):
+        """Auto-save an image's annotations in the background"""
+        if not self.image_dir:
+            return
+        
+        self._pending_saves.add(image_path)
+        if self._save_job is None:
+            self._save_job = self.root.after(SAVE_DELAY_MS, self.queue_pending_saves)
+    
+    def queue_pending_saves(self):
+        """Hand all pending auto-saves to the background writer"""
+        if self._save_job is not None:
+            self.root.after_cancel(self._save_job)
+            self._save_job = None
+        
+        for image_path in self._pending_saves:
+            job = self.snapshot_annotation(image_path)
+            if job:
+                self._save_queue.put(job)
+        self._pending_saves.clear()
+    
+    def flush_saves(self):
+        """Write all pending auto-saves and wait until they are on disk"""
+        self.queue_pending_saves()
+        self._save_queue.join()
+    
+    def _save_worker(self):
+        """Background thread writing queued label files"""
+        while True:
+            job = self._save_queue.get()
+            try:
+                self.write_annotation_file(*job)
+            except Exception as e:
+                print(f"Error saving annotation file {job[1]}: {e}")
+            finally:
+                self._save_queue.task_done()
+    
     def save_all_annotations(self):
         """Save all annotations to YOLO format files"""
         if not self.image_dir:
@@ -1206,12 +1676,21 @@ class YOLOLabeler:
             return
         
         try:
-            # Save annotations for all images
+            # Make sure queued auto-saves don't overwrite the files below
+            self.flush_saves()
+            
+            # Save annotations for all images, overlapping the file writes
             saved_count = 0
-            for image_path in self.image_files:
-                self.save_annotation_for_image(image_path)
-                if str(image_path) in self.annotations and self.annotations[str(image_path)]:
-                    saved_count += 1
+            with ThreadPoolExecutor(max_workers=SAVE_ALL_WORKERS) as pool:
+                writes = []
+                for image_path in self.image_files:
+                    job = self.snapshot_annotation(image_path)
+                    if job:
+                        writes.append(pool.submit(self.write_annotation_file, *job, force=True))
+                    if image_path in self.annotations and self.annotations[image_path]:
+                        saved_count += 1
+                for write in writes:
+                    write.result()
             
             # Save classes file
             self.export_classes(auto=True)
@@ -1222,12 +1701,29 @@ class YOLOLabeler:
             messagebox.showinfo("Save Complete", 
                               f"Saved annotations for {saved_count} images\n" + 
                               f"Labels saved to: {labels_path}\n" +
-                              f"Classes saved to classes.txt")
+                              f"Classes saved to classes.txt and classes.json")
         except Exception as e:
             messagebox.showerror("Save Error", f"Error saving annotations: {str(e)}")
     
-    def load_annotation_for_image(self, image_path):
-        """Load annotation for a single image from YOLO format"""
+    def list_label_stems(self):
+        """Return the stems of all label files, read with one directory listing"""
+        labels_dir = self.get_labels_dir()
+        if not labels_dir:
+            return set()
+        
+        # Directory entries carry their names, so no per-file Path or stat is needed
+        try:
+            with os.scandir(labels_dir) as entries:
+                return {entry.name[:-4] for entry in entries if entry.name.endswith('.txt')}
+        except FileNotFoundError:
+            return set()
+    
+    def load_annotation_for_image(self, image_path, label_stems=None):
+        """Load annotation for a single image from YOLO format
+        
+        label_stems, from list_label_stems, saves a stat per image when
+        loading a whole directory.
+        """
         # Get labels directory
         labels_dir = self.get_labels_dir()
         if not labels_dir:
@@ -1237,13 +1733,15 @@ class YOLOLabeler:
         txt_filename = image_path.stem + '.txt'
         txt_path = labels_dir / txt_filename
         
-        if not txt_path.exists():
+        if label_stems is not None:
+            if image_path.stem not in label_stems:
+                return
+        elif not txt_path.exists():
             return
         
         # Load image to get dimensions
         try:
-            with Image.open(image_path) as img:
-                img_width, img_height = img.size
+            img_width, img_height = self.get_image_size(image_path)
         except Exception as e:
             print(f"Error loading image {image_path}: {e}")
             return
@@ -1251,15 +1749,28 @@ class YOLOLabeler:
         # Read annotation file
         try:
             with open(txt_path, 'r') as f:
-                lines = f.readlines()
+                text = f.read()
+                stat = os.fstat(f.fileno())
+            self._label_contents[txt_path] = (text, (stat.st_mtime_ns, stat.st_size))
+            lines = text.splitlines()
             
-            image_path_str = str(image_path)
-            self.annotations[image_path_str] = []
+            try:
+                rows = np.loadtxt(lines, ndmin=2) if text.strip() else np.empty((0, 5))
+            except ValueError:
+                rows = None
             
-            for line in lines:
-                box = self.yolo_to_box(line, img_width, img_height)
-                if box and 0 <= box['class_id'] < len(self.classes):
-                    self.annotations[image_path_str].append(box)
+            if rows is not None and rows.shape[1] == 5:
+                annotations = self.yolo_rows_to_annotations(rows, img_width, img_height)
+            else:
+                # Malformed file, keep whichever lines do parse
+                boxes = []
+                for line in lines:
+                    box = self.yolo_to_box(line, img_width, img_height)
+                    if box and 0 <= box['class_id'] < len(self.classes):
+                        boxes.append(box)
+                annotations = ImageAnnotations.from_dicts(boxes)
+            
+            self.annotations[image_path] = annotations
         except Exception as e:
             print(f"Error loading annotation file {txt_path}: {e}")
     
@@ -1275,11 +1786,15 @@ class YOLOLabeler:
             return
         
         try:
+            # Let queued auto-saves land before the files are read back
+            self.flush_saves()
+            
             # Load annotations for all images
+            label_stems = self.list_label_stems()
             loaded_count = 0
             for image_path in self.image_files:
-                self.load_annotation_for_image(image_path)
-                if str(image_path) in self.annotations and self.annotations[str(image_path)]:
+                self.load_annotation_for_image(image_path, label_stems)
+                if image_path in self.annotations and self.annotations[image_path]:
                     loaded_count += 1
             
             # Refresh display
@@ -1291,7 +1806,11 @@ class YOLOLabeler:
             messagebox.showerror("Load Error", f"Error loading annotations: {str(e)}")
     
     def export_classes(self, auto=False):
-        """Export class names to classes.txt file"""
+        """Export class names to classes.txt and full definitions to classes.json
+        
+        classes.txt is the standard YOLO names file; classes.json also keeps
+        the colors and custom YOLO IDs so they survive a re-import.
+        """
         if not self.image_dir and not auto:
             messagebox.showwarning("No Directory", "Please open a directory first")
             return
@@ -1306,12 +1825,20 @@ class YOLOLabeler:
             classes_path = self.image_dir / 'classes.txt'
         else:
             classes_path = Path('classes.txt')
+        json_path = classes_path.with_suffix('.json')
         
         try:
             with open(classes_path, 'w') as f:
                 for class_name in self.classes:
                     f.write(f"{class_name}\n")
             
+            with open(json_path, 'w') as f:
+                json.dump({'classes': [{'name': class_name,
+                                        'color': self.classes.color(i),
+                                        'id': self.classes.yolo_id(i)}
+                                       for i, class_name in enumerate(self.classes)]},
+                          f, indent=2)
+            
             if not auto:
                 messagebox.showinfo("Export Complete", 
                                   f"Classes exported to {classes_path}")
@@ -1319,20 +1846,81 @@ class YOLOLabeler:
             if not auto:
                 messagebox.showerror("Export Error", f"Error exporting classes: {str(e)}")
     
+    def find_classes_file(self):
+        """Return the classes file to load from the image directory, or None
+        
+        classes.json also keeps colors and custom IDs, but only Export and
+        Save All write it. It is used while it is at least as new as
+        classes.txt or lists the same names, so hand edits to classes.txt win.
+        """
+        txt_path = self.image_dir / 'classes.txt'
+        json_path = self.image_dir / 'classes.json'
+        if not json_path.exists():
+            return txt_path if txt_path.exists() else None
+        if not txt_path.exists():
+            return json_path
+        if json_path.stat().st_mtime_ns >= txt_path.stat().st_mtime_ns:
+            return json_path
+        
+        try:
+            json_names = [name for name, _, _ in self.read_class_definitions(json_path)]
+        except Exception:
+            return txt_path
+        txt_names = [name for name, _, _ in self.read_class_definitions(txt_path)]
+        return json_path if json_names == txt_names else txt_path
+    
+    def read_class_definitions(self, file_path):
+        """Read (name, color, yolo_id) tuples from a classes.txt or classes.json file
+        
+        classes.txt names use their line number as YOLO ID and get the default
+        colors, then random ones; classes.json entries carry their own color
+        and ID (None when missing). Invalid entries raise ValueError, so callers
+        can read the file before discarding the current classes.
+        """
+        file_path = Path(file_path)
+        if file_path.suffix.lower() == '.json':
+            class_defs = [(c['name'], c.get('color'), c.get('id'))
+                          for c in json.loads(file_path.read_text())['classes']]
+            id_limit = max_class_id(len(class_defs))
+            checked = []
+            for class_name, color, class_id in class_defs:
+                valid_id = (class_id is None or
+                            (type(class_id) is int and 0 <= class_id <= id_limit))
+                if not valid_id:
+                    raise ValueError(f"Class '{class_name}' has invalid YOLO ID {class_id!r} "
+                                     f"(expected 0-{id_limit})")
+                if color is not None:
+                    # Accept any color PIL understands ('#fff', 'red', ...) as '#rrggbb'
+                    try:
+                        color = "#{:02x}{:02x}{:02x}".format(*ImageColor.getrgb(str(color))[:3])
+                    except ValueError:
+                        raise ValueError(f"Class '{class_name}' has invalid color {color!r}")
+                checked.append((class_name, color, class_id))
+            return checked
+        
+        lines = file_path.read_text().splitlines()
+        colors = list(DEFAULT_CLASS_COLORS)
+        if len(lines) > len(colors):
+            colors += ["#{:06x}".format(c) for c in
+                       np.random.randint(0, 0x1000000, size=len(lines) - len(colors)).tolist()]
+        
+        # Use line index as YOLO ID (standard YOLO format)
+        return [(line.strip(), colors[i], i) for i, line in enumerate(lines) if line.strip()]
+    
     def import_classes(self):
-        """Import class names from classes.txt file"""
+        """Import classes from a classes.txt or classes.json file"""
         # Ask user to select classes file
         file_path = filedialog.askopenfilename(
-            title="Select classes.txt file",
-            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+            title="Select classes file",
+            filetypes=[("Class files", "*.txt *.json"), ("Text files", "*.txt"),
+                       ("JSON files", "*.json"), ("All files", "*.*")]
         )
         
         if not file_path:
             return
         
         try:
-            with open(file_path, 'r') as f:
-                lines = f.readlines()
+            class_defs = self.read_class_definitions(file_path)
             
             # Clear existing classes
             if self.classes:
@@ -1340,21 +1928,11 @@ class YOLOLabeler:
                                           "Replace existing classes?\nAll current annotations will be lost."):
                     return
                 self.classes.clear()
-                self.class_colors.clear()
-                self.class_ids.clear()
                 self.annotations.clear()
             
             # Load new classes
-            colors = ['#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF', 
-                     '#00FFFF', '#FF8800', '#8800FF', '#00FF88']
-            
-            for i, line in enumerate(lines):
-                class_name = line.strip()
-                if class_name:
-                    color = colors[i % len(colors)] if i < len(colors) else \
-                           "#{:06x}".format(random.randint(0, 0xFFFFFF))
-                    # Use line index as YOLO ID (standard YOLO format)
-                    self.add_class(class_name, color, i)
+            for class_name, color, class_id in class_defs:
+                self.add_class(class_name, color, class_id)
             
             # Update UI
             self.selected_class_index = 0 if self.classes else None
@@ -1365,6 +1943,13 @@ class YOLOLabeler:
         except Exception as e:
             messagebox.showerror("Import Error", f"Error importing classes: {str(e)}")
     
+    def on_close(self):
+        """Write pending annotations and close the application"""
+        self.flush_saves()
+        self.clear_image_cache()
+        self._prefetch_pool.shutdown(wait=False)
+        self.root.destroy()
+    
     def show_help(self):
         """Show help dialog with keyboard shortcuts"""
         help_text = """
@@ -1393,7 +1978,9 @@ YOLOv8 Directory Structure:
   • Images: Located in your selected directory
   • Labels: Automatically saved to 'labels' subdirectory
   • If images are in 'images' dir, labels go to parallel 'labels' dir
-  • Classes: Saved as classes.txt in image directory
+  • Classes: Saved as classes.txt and classes.json in image directory
+  • classes.json keeps colors and custom IDs and is loaded first,
+    unless classes.txt was edited since and lists different names
 
 Tips:
   • Click inside a box to select and move it